@@ -33,8 +33,8 @@ import matplotlib.pyplot as plt
 from matplotlib import gridspec
 from scipy.interpolate import interp1d
 from astroquery.vizier import Vizier
-from chainconsumer import ChainConsumer
 from datetime import datetime
+from functools import lru_cache
 
 from concord import diskmodel as dm
 
@@ -65,6 +65,62 @@ if os.path.isfile(CONCORD_PATH+'/table2.tex'):
 
 # ------- --------- --------- --------- --------- --------- --------- ---------
 
+@lru_cache(maxsize=64)
+def _read_table(filename, mtime):
+    '''
+    Reads in a model summary or parameter table, caching the result so that
+    the many :py:class:`concord.burstclass.KeplerBurst` objects generated
+    from the same batch only read (and parse) it once. Pass the absolute
+    path, so the cache isn't confused by a change of directory. The
+    modification time is part of the cache key, so that a table which is
+    rewritten (e.g. after adding runs to a batch) is read in again. The
+    table returned is shared between all the callers, so shouldn't be
+    modified; take a copy instead
+
+    :param filename: absolute path of the table to read
+    :param mtime: modification time of the file, from ``os.path.getmtime``
+    :return: astropy Table with the file contents
+    '''
+
+    return ascii.read(filename)
+
+@lru_cache(maxsize=64)
+def _batch_run_index(filename, mtime):
+    '''
+    Builds (and caches) a dictionary giving the row for each (batch, run)
+    pair in the table read by :py:meth:`concord.burstclass._read_table`, so
+    that individual runs can be found without scanning the whole table
+
+    :param filename: absolute path of the table
+    :param mtime: modification time of the file, from ``os.path.getmtime``
+    :return: dict with the row index for each (batch, run) pair
+    '''
+
+    data = _read_table(filename, mtime)
+    index = {}
+    for i, key in enumerate(zip(data['batch'], data['run'])):
+        # keep the first matching row, in case of duplicates
+        index.setdefault(key, i)
+
+    return index
+
+def _find_row(filename, mtime, batch, run):
+    '''
+    Returns the row(s) matching the batch and run in the table, as an
+    array, i.e. equivalent to
+    ``np.where(np.logical_and(data['batch'] == batch, data['run'] == run))[0]``
+    but keeping only the first match. Pass the same mtime used to read the
+    table, so the row index always matches the table it's used with
+    '''
+
+    index = _batch_run_index(filename, mtime)
+    if (batch, run) in index:
+        return np.array([index[(batch, run)]])
+
+    return np.array([], dtype=int)
+
+# ------- --------- --------- --------- --------- --------- --------- ---------
+
 def fper(mburst, param, c_bol=1.0):
     '''
     Calculates the persistent flux, based on the supplied mdot, redshift
@@ -120,6 +176,20 @@ def fper(mburst, param, c_bol=1.0):
 
 # ------- --------- --------- --------- --------- --------- --------- ---------
 
+def _inclination_deg(inclination):
+    '''
+    Returns the inclination as a plain float (or array) in degrees, as
+    required by :py:meth:`concord.diskmodel._anisotropy_deg`. As for
+    :py:meth:`concord.diskmodel.anisotropy`, values without units are
+    assumed to be in degrees already
+    '''
+
+    if hasattr(inclination,'unit'):
+        return inclination.to_value(u.degree)
+
+    print ("** WARNING ** assuming inclination in degrees")
+    return inclination
+
 def modelFunc(p,obs,model, disc_model):
     '''
     This function performs the stretching and rescaling of the (model
@@ -137,9 +207,10 @@ def modelFunc(p,obs,model, disc_model):
     dist, inclination, _opz, t_off = p
 
 # Use the anisotropy function to calculate the anisotropy factors given
-# the inclination
+# the inclination. This is called for every likelihood evaluation, so
+# we use the version that skips the Quantity handling
 
-    xi_b, xi_p = dm.anisotropy(inclination)
+    xi_b, xi_p = dm._anisotropy_deg(_inclination_deg(inclination))
 
     # The combination of an input redshift an model gravity uniquely define
     # a mass-radius combination
@@ -313,9 +384,13 @@ class Lightcurve(object):
             f.write("# Columns:\n")
             f.write("# time ({}), dt ({}), flux ({}), flux_err\n".format(self.time.unit,self.dt.unit,flux_unit))
 
+            # strip the units before writing, so that the writer is passed plain
+            # floats rather than a Quantity object for every value
+
             writer = csv.writer(f, delimiter=',')
             writer.writerows(zip(self.time.value,self.dt.value,
-                                 self.flux/flux_unit,self.flux_err/flux_unit))
+                                 (self.flux/flux_unit).to_value(u.dimensionless_unscaled),
+                                 (self.flux_err/flux_unit).to_value(u.dimensionless_unscaled)))
 
 # ------- --------- --------- --------- --------- --------- --------- ---------
 
@@ -419,7 +494,7 @@ class Lightcurve(object):
         # First unpack the simulation parameters
 
         dist, inclination, _opz, t_off = param
-        xi_b, xi_p = dm.anisotropy(inclination, model=disc_model)
+        xi_b, xi_p = dm._anisotropy_deg(_inclination_deg(inclination), model=disc_model)
 
         if (obs == None):
 
@@ -742,22 +817,24 @@ class ObservedBurst(Lightcurve):
         # First read in the table
         # Because we apply this at the class level, it's available to all instances
         # Other attributes have to be applied at the instance level
+        # Only want to do this once, as the table doesn't change between calls
 
-        cls.table_file = os.path.join(CONCORD_PATH, 'table2.tex')
-        cls.table = Table.read(cls.table_file)
+        if not hasattr(cls,'table'):
+            cls.table_file = os.path.join(CONCORD_PATH, 'table2.tex')
+            cls.table = Table.read(cls.table_file)
 
-        # Below we associate each epoch with a file
+            # Below we associate each epoch with a file
 
-        file = ['gs1826-24_5.14h.dat',
-                'gs1826-24_4.177h.dat',
-                'gs1826-24_3.530h.dat',
-                'saxj1808.4-3658_16.55h.dat',
-                'saxj1808.4-3658_21.10h.dat',
-                'saxj1808.4-3658_29.82h.dat',
-                '4u1820-303_2.681h.dat',
-                '4u1820-303_1.892h.dat',
-                '4u1636-536_superburst.dat']
-        cls.table['file'] = file
+            file = ['gs1826-24_5.14h.dat',
+                    'gs1826-24_4.177h.dat',
+                    'gs1826-24_3.530h.dat',
+                    'saxj1808.4-3658_16.55h.dat',
+                    'saxj1808.4-3658_21.10h.dat',
+                    'saxj1808.4-3658_29.82h.dat',
+                    '4u1820-303_2.681h.dat',
+                    '4u1820-303_1.892h.dat',
+                    '4u1636-536_superburst.dat']
+            cls.table['file'] = file
 
         # Now find which one you mean. Want to assemble a key that will match the filename
 
@@ -956,8 +1033,8 @@ class ObservedBurst(Lightcurve):
 # then do the comparison
 # Should probably incorporate these calculations into the class, so you
 # can just refer to them as an attribute
-
-        lhood_cpt = np.array([])
+# The components are assembled into a single array at the end, rather than
+# appending (and so copying the array) for each one
 
         # Persistent flux
 
@@ -969,9 +1046,9 @@ class ObservedBurst(Lightcurve):
         else:
             print ('concord.compare: ** WARNING ** no uncertainty on F_per')
             fper_sig2 = 1.0
-        lhood_cpt = np.append(lhood_cpt, -weights['fluxwt']*( 
-               (self.fper.value-fper_pred.value)**2*fper_sig2 
-               +np.log(2.*pi/fper_sig2) ) )
+        lhood_fper = -weights['fluxwt']*(
+               (self.fper.value-fper_pred.value)**2*fper_sig2
+               +np.log(2.*pi/fper_sig2) )
 
         # recurrence time
 
@@ -980,9 +1057,9 @@ class ObservedBurst(Lightcurve):
         #        (self.tdel.value-mburst.tdel.value*_opz)**2*tdel_sig2
         #        +np.log(2.*pi/tdel_sig2) ) )
         tdel_sig2 = 1.0 / (self.tdel_err.value**2+sim_burst.tdel_err.value**2)
-        lhood_cpt = np.append(lhood_cpt, -weights['tdelwt']*(
+        lhood_tdel = -weights['tdelwt']*(
                 (self.tdel.value-sim_burst.tdel.value)**2*tdel_sig2
-                +np.log(2.*pi/tdel_sig2) ) )
+                +np.log(2.*pi/tdel_sig2) )
 
         # lightcurve
 
@@ -990,9 +1067,10 @@ class ObservedBurst(Lightcurve):
         # lhood_cpt = np.append(lhood_cpt,
         # 	-0.5 * np.sum( (model.value-self.flux.value)**2*inv_sigma2
         #         +np.log(2.0*pi/inv_sigma2) ) )
-        lhood_cpt = np.append(lhood_cpt,
-         	-0.5 * np.sum( (sim_burst.flux.value-self.flux.value)**2*inv_sigma2
-                 +np.log(2.0*pi/inv_sigma2) ) )
+        lhood_lc = -0.5 * np.sum( (sim_burst.flux.value-self.flux.value)**2*inv_sigma2
+                 +np.log(2.0*pi/inv_sigma2) )
+
+        lhood_cpt = np.hstack((lhood_fper, lhood_tdel, lhood_lc))
 
         if debug:
             cl=0.0
@@ -1092,6 +1170,12 @@ class KeplerBurst(Lightcurve):
     :R_NS: model-assumed radius of the neutron star (GR)
     :g: surface gravity assumed for the run
 
+    For KEPLER models, the summary (and parameter) tables are read only once
+    for all the runs in a batch; the data (and param) attribute of each
+    instance is a shallow copy of the shared table. Columns can be added,
+    removed or replaced on it without affecting other instances, but
+    editing the column values in place changes them for all of them
+
     An example call is as follows:
 
     >>> c_loZ=KeplerBurst(filename='mean1.data',path='kepler', lAcc=0.1164,Z=0.005,H=0.7, tdel=4.06/opz,tdel_err=0.17/opz, g = 1.858e+14*u.cm/u.s**2, R_NS=11.2*u.km)
@@ -1189,11 +1273,13 @@ class KeplerBurst(Lightcurve):
                 else:
                     self.summ_file = "../../summ_{}.txt".format(source)
 
-                self.data = ascii.read(self.path+"/"+self.summ_file)
+                summ_path = os.path.abspath(self.path+"/"+self.summ_file)
+                summ_mtime = os.path.getmtime(summ_path)
+                self.data = _read_table(summ_path, summ_mtime).copy(copy_data=False)
 
                 # Find the corresponding row
 
-                self.row = np.where(np.logical_and(self.data['batch'] == batch,self.data['run'] == run))[0]
+                self.row = _find_row(summ_path, summ_mtime, batch, run)
 
 # Set some special parameters here (others are set with the kwargs later
 # on). A couple of conventions for column names here
@@ -1211,8 +1297,10 @@ class KeplerBurst(Lightcurve):
 # Set the gravity and NS mass
 
                 if not ('mass' in self.data.columns):
-                    self.param = ascii.read(self.path+"/../../params_{}.txt".format(source))
-                    self.row_p = np.where(np.logical_and(self.param['batch'] == batch,self.param['run'] == run))[0]
+                    param_path = os.path.abspath(self.path+"/../../params_{}.txt".format(source))
+                    param_mtime = os.path.getmtime(param_path)
+                    self.param = _read_table(param_path, param_mtime).copy(copy_data=False)
+                    self.row_p = _find_row(param_path, param_mtime, batch, run)
 
                     self.M_NS = self.param['mass'][self.row_p][0]*u.Msun
                 else:
@@ -1245,7 +1333,8 @@ class KeplerBurst(Lightcurve):
 
                     print ("** WARNING ** can't get Vizier table, using local file")
                     self.table_file='/Users/duncan/Documents/2015/Nat new catalog/summ.csv'
-                    self.data = ascii.read(self.table_file)
+                    self.data = _read_table(self.table_file,
+                        os.path.getmtime(self.table_file)).copy(copy_data=False)
 
 # Local file columns are slightly different: 'model','num','acc','z','h','lAcc','pul','cyc','
 # burstLength','uBurstLength','peakLum','uPeakLum','persLum','uPersLum','fluence','uFluence',
@@ -1498,6 +1587,15 @@ def lhoodClass(params, obs, model, **kwargs):
 
     >>> sampler = emcee.EnsembleSampler(nwalkers, ndim, lhoodClass, args=[obs, models, weights])
 
+    The likelihood is plain Python (and so limited by the GIL), so to run
+    the walkers in parallel pass a process pool rather than using threads;
+    this function and its arguments can be pickled, as required:
+
+    >>> from multiprocessing import Pool
+    >>> with Pool(4) as pool:
+    ...     sampler = emcee.EnsembleSampler(nwalkers, ndim, lhoodClass, args=[obs, models], pool=pool)
+    ...     sampler.run_mcmc(pos, nsteps)
+
     Use the kwargs construction to pass the additional parameters weights,
     disc_model to the compare method if required
 
@@ -1550,14 +1648,14 @@ def plot_comparison(obs,models,param=None,sampler=None,ibest=None):
 
 # Need to specify at least one of param, sampler
 
-    assert ((param != None) | (sampler != None))
+    assert (param is not None) or (sampler is not None)
 
-    if param == None:
+    if param is None:
 
 # If no parameters are specified, try to get the best example
 # from the sampler object
 
-        if ibest == None:
+        if ibest is None:
 
 # Identify the maximum probability set of parameters
 
@@ -1640,6 +1738,10 @@ def plot_contours(sampler,parameters=[r"$d$",r"$i$",r"$1+z$"],
     Documentation is here https://samreay.github.io/ChainConsumer/index.html
     '''
 
+    # ChainConsumer is only needed here, and is slow to import, so we don't
+    # load it with the rest of the module
+    from chainconsumer import ChainConsumer
+
     nwalkers, nsteps, ndim = np.shape(sampler.chain)
 
     samples = sampler.chain[:, ignore:, :].reshape((-1, ndim))
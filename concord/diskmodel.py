@@ -1,11 +1,9 @@
 import numpy as np
 from math import *
-import matplotlib.pyplot as plt
-import astropy.io.ascii as ascii
-from scipy.interpolate import interp1d
 import astropy.units as u
 import astropy.uncertainty as unc
 import os
+from functools import lru_cache
 
 import pkg_resources
 
@@ -16,14 +14,29 @@ he16_models = ['he16_a', 'he16_b', 'he16_c', 'he16_c_short', 'he16_d']
 
 def load_he16(model):
     """Reads in and returns the He & Keek (2016) model specified."""
+    import astropy.io.ascii as ascii
+
     model_str = model.split('he16_')[1]
     he16_filename = 'anisotropy_{}.txt'.format(model_str)
     he16_filepath = os.path.join(CONCORD_PATH, he16_filename)
-    a=ascii.read(he16_filepath)
+    # the tables are all whitespace-delimited with no header (apart from
+    # comments), so we skip the format guessing and use the fast reader
+    a=ascii.read(he16_filepath, format='no_header', guess=False, fast_reader=True)
 
     return a
 
 
+@lru_cache(maxsize=None)
+def _he16_columns(model):
+    """Returns the He & Keek (2016) model specified as a tuple of
+    contiguous float64 arrays (inclination in degrees, 1/xi_d, 1/xi_r,
+    1/xi_p). The table is read only on the first call for each model"""
+    a = load_he16(model=model)
+
+    return tuple(np.ascontiguousarray(a[col], dtype=np.float64)
+                 for col in ('col1','col2','col3','col4'))
+
+
 def anisotropy(inclination, model='he16_a', test=False):
     '''This function returns the burst and persistent anisotropy factors
 
@@ -36,15 +49,17 @@ def anisotropy(inclination, model='he16_a', test=False):
     Generate a test of the model using
     xi_b, xi_p = anisotropy(45.,test=True)'''
 
-    global anisotropy_he16
-
     if test == True:
 
 # Optionally plot a figure showing the behaviour
 # want to replicate Figure 2 from fuji88
+# matplotlib is only imported here, as it's slow to load and not otherwise
+# required
+
+        import matplotlib.pyplot as plt
 
         _theta = np.arange(50)/49.*pi/2.*u.radian
-        ct = np.cos(_theta)
+        ct = np.cos(_theta.value)
 
         fig, ax = plt.subplots(constrained_layout=True)
 
@@ -60,27 +75,22 @@ def anisotropy(inclination, model='he16_a', test=False):
                                                      lambda i: np.cos(np.deg2rad(i))))
         secax.set_xlabel("Inclination [deg]")
 
-        s='-'
-        # for m in ['fuji88' ,'he16']:
-        for m in ['fuji88' ,'he16_a']:
-            xi_p = np.zeros(len(_theta))
-            xi_b = np.zeros(len(_theta))
-            for i, _th in enumerate(_theta):
-                xi_b[i], xi_p[i] = anisotropy(_th,model=m)
+        # calculate the factors for both models up front, for the whole array
+        # of angles (in degrees) at once; the loop below just does the plotting
+        _deg = np.degrees(_theta.value)
+        curves = [(m, s, *_anisotropy_deg(_deg, model=m)) for m, s in [('fuji88', '-'), ('he16_a', ':')]]
 
+        for m, s, xi_b, xi_p in curves:
             ax.plot(ct,1./xi_b,'b'+s,label=r"$\xi_b^{-1}$ ("+m+")")
             ax.plot(ct,1./xi_p,'r'+s,label=r"$\xi_p^{-1}$ ("+m+")")
             ax.plot(ct,xi_p/xi_b,'g'+s,label=r"$\xi_p/\xi_b$ ("+m+")")
 
-            s=':'
-
         ax.legend()
 
         fig.show()
 
-    # Calculate the values for the passed quantity, and return
-    # numpy cos will correctly treat the units, so no need to do a conversion
-    # in that case
+    # Calculate the values for the passed quantity, and return; the units
+    # are converted and stripped once, before the models are evaluated
 
     # Ensure the routine works with astropy distributions as well as arrays
     if hasattr(inclination,'distribution'):
@@ -93,44 +103,58 @@ def anisotropy(inclination, model='he16_a', test=False):
         print ("** WARNING ** assuming inclination in degrees")
         theta *= u.degree
 
-    if model == 'fuji88':
-        xi_b = 1./(0.5+abs(np.cos(theta)))
-        xi_p = 0.5/abs(np.cos(theta))
+    if (model != 'fuji88') and (model not in he16_models):
+        print ("** ERROR ** model ",model," not yet implemented!")
+        return None, None
 
-        if scalar:
-            return xi_b, xi_p
-        else:
-            return unc.Distribution(xi_b*u.dimensionless_unscaled), \
-                   unc.Distribution(xi_p*u.dimensionless_unscaled)
+    xi_b, xi_p = _anisotropy_deg(theta.to(u.degree).value, model=model)
 
+    if scalar:
+        if model == 'fuji88':
+            # the fuji88 factors are returned as (dimensionless) quantities
+            return xi_b*u.dimensionless_unscaled, xi_p*u.dimensionless_unscaled
+        return xi_b, xi_p
+    else:
+        return unc.Distribution(xi_b*u.dimensionless_unscaled), \
+               unc.Distribution(xi_p*u.dimensionless_unscaled)
 
-    elif model in he16_models:
-        model_str = model.split('he16_')[1]   # cut out prefix
 
-        if 'anisotropy_he16' not in globals():
-            anisotropy_he16 = {}
+def _anisotropy_deg(angle_deg, model='he16_a'):
+    '''Calculates the burst and persistent anisotropy factors for the
+    inclination angle_deg, a plain float (or array) in degrees. This
+    bypasses the Quantity handling of anisotropy() entirely, and so is
+    intended for the likelihood calculations, where it's called for every
+    walker at every step'''
 
-        if model_str not in globals()['anisotropy_he16']:
-            a = load_he16(model=model)
-            v = np.stack((a['col2'],a['col3'],a['col4']),axis=1).T
-            anisotropy_he16[model_str] = interp1d(a['col1'],v)
+    ang = np.asarray(angle_deg, dtype=np.float64)
 
-        inv_xi_d, inv_xi_r, inv_xi_p = anisotropy_he16[model_str](theta.to(u.degree))
+    if model == 'fuji88':
+        c = np.abs(np.cos(np.deg2rad(ang)))
+        with np.errstate(divide='ignore'):
+            xi_b = 1./(0.5+c)
+            xi_p = 0.5/c
+
+    elif model in he16_models:
+        _he16_x, _he16_d, _he16_r, _he16_p = _he16_columns(model)
+
+        # the table is linear in angle, so np.interp will do the job (and is
+        # much faster than interp1d); but it doesn't check the bounds, so we
+        # do that here, as interp1d did
+        if np.any((ang < _he16_x[0]) | (ang > _he16_x[-1])):
+            raise ValueError("inclination outside the range of model {}".format(model))
+
+        inv_xi_d = np.interp(ang, _he16_x, _he16_d)
+        inv_xi_r = np.interp(ang, _he16_x, _he16_r)
+        inv_xi_p = np.interp(ang, _he16_x, _he16_p)
 
         with np.errstate(divide='ignore'):
             xi_b = 1./(inv_xi_d+inv_xi_r)
             xi_p = 1./inv_xi_p
 
-        if scalar:
-            return xi_b, xi_p
-        else:
-            return unc.Distribution(xi_b*u.dimensionless_unscaled), \
-                   unc.Distribution(xi_p*u.dimensionless_unscaled)
-
-
     else:
-        print ("** ERROR ** model ",model," not yet implemented!")
-        return None, None
+        raise ValueError("model {} not yet implemented".format(model))
+
+    return xi_b, xi_p
 
 
 def inclination(xi, model='he16_a', burst=True):
@@ -142,6 +166,8 @@ def inclination(xi, model='he16_a', burst=True):
 
     results are returned in units of degrees'''
 
+    from scipy.interpolate import interp1d
+
     if model == 'fuji88':
         if burst:
             return np.arccos(1.0/xi - 0.5) * 180./np.pi * u.degree / u.rad
@@ -172,6 +198,8 @@ def inclination(xi, model='he16_a', burst=True):
 def inclination_ratio(xi_ratio, model='he16_a'):
     '''Returns the inclination corresponding to a given xi_p/xi_b ratio.
         Returned in units of degrees'''
+    from scipy.interpolate import interp1d
+
     inc = np.linspace(0*u.deg, 90*u.deg, 180)
 
     xi_b, xi_p = anisotropy(inclination=inc, model=model)
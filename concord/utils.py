@@ -57,6 +57,7 @@ from .diskmodel import *
 import astropy.constants as const
 from scipy.special import erfinv
 import re
+from functools import lru_cache
 
 import logging
 
@@ -534,9 +535,15 @@ def solve_radius(M,R_Newt,eta=1e-6):
     :return: neutron-star radius R in GR
     '''
 
+    # the Newtonian gravity is fixed, so we only calculate it once, and the
+    # GR value once per iteration; each of these involves several
+    # (relatively slow) Quantity operations
+    g_Newt = g(M,R_Newt,Newt=True)
     R = R_Newt	# trial
-    while (abs(g(M,R)-g(M,R_Newt,Newt=True))/g(M,R) > eta):
+    g_R = g(M,R)
+    while (abs(g_R-g_Newt)/g_R > eta):
         R = R_Newt*sqrt(redshift(M,R))
+        g_R = g(M,R)
 
     return R
 
@@ -615,8 +622,13 @@ def tdel_dist(nburst, exp, nsamp=NSAMP_DEF):
 
     assert (1. - max(prob)) < 1e-6
 
+    # prob increases monotonically with mu, so rather than scanning the whole
+    # array for each sample, we find the bracketing pair of values for all the
+    # samples at once, and pick the closest (the lower one in case of a tie)
+
     x = np.random.random(nsamp)
-    y = [mu[np.argmin(abs(prob - _x))] for _x in x]
+    i = np.clip(np.searchsorted(prob, x), 1, len(mu) - 1)
+    y = mu[np.where(x - prob[i - 1] <= prob[i] - x, i - 1, i)]
 
     return unc.Distribution( exp / y )
 
@@ -805,11 +817,29 @@ def _i(obj, ind):
         return obj.distribution[ind]
     try:
         return obj[ind]
-    except:
+    except (TypeError, IndexError):
         return obj
 
 # ------- --------- --------- --------- --------- --------- --------- ---------
 
+@lru_cache(maxsize=None)
+def _alpha_0(old_relation=False):
+    """
+    Utility function giving the ratio of :math:`c^2` to the slope of the
+    linear approximation to Q_nuc, for use with hfrac. The value is cached,
+    as hfrac calls itself once for each sample in a distribution, and the
+    unit conversion is slow enough to be noticeable
+
+    :param old_relation: use the earlier approximation for Q_nuc
+    :return: alpha_0 (dimensionless)
+    """
+
+    q_0, q_1 = Q_nuc(0.0, old_relation=old_relation, quadratic=False, coeff=True)
+
+    return const.c ** 2 / (q_1 * u.MeV / const.m_p).to("m**2/s**2")
+
+# ------- --------- --------- --------- --------- --------- --------- ---------
+
 def hfrac(_tdel, _alpha=None, fper=None, fluen=None, c_bol=None,
           zcno=0.02, opz=OPZ, old_relation=False,
           isotropic=False, inclination=None, imin=0.0, imax=IMAX_NDIP,
@@ -900,7 +930,10 @@ def hfrac(_tdel, _alpha=None, fper=None, fluen=None, c_bol=None,
 
     # Does this need to change if the Q_nuc coefficients also change? YES
     # alpha_0 = const.c**2/(6.6*u.MeV/const.m_p).to("m**2/s**2")
-    alpha_0 = const.c ** 2 / (q_1 * u.MeV / const.m_p).to("m**2/s**2")
+    # This is the same for every call with the same Q_nuc relation, so we
+    # get it from the (cached) _alpha_0 rather than recalculating it for
+    # every sample in the loop below
+    alpha_0 = _alpha_0(old_relation)
 
     # This parameter sets the prefactor for the time to burn all H via hot-CNO; see
     # Lampe et al. (2016, ApJ 819, 46)
@@ -1169,6 +1202,7 @@ def dist(_F_pk, nsamp=None, dip=False,
     # we have a distribution, so calculate the percentiles and plot if required
     if plot:
         # Do a simple plot of the distance distribution
+        import matplotlib.pyplot as plt
 
         with quantity_support():
             plt.hist(dist.distribution, bins=50, density=True)
@@ -1302,6 +1336,7 @@ def luminosity(_F_X, dist=None, c_bol=None, nsamp=None, burst=True, dip=False,
 
     if plot:
         # Do a simple plot of the distance distribution
+        import matplotlib.pyplot as plt
 
         plt.hist(lum.distribution / (u.erg/u.s), bins=50, density=True)
         plt.xlabel(label)
@@ -1349,7 +1384,8 @@ def L_Edd(F_pk, dist=8 * u.kpc, nsamp=NSAMP_DEF,
     :return: dictionary including calculation results and assumed distributions (as for luminosity)
     '''
 
-    return luminosity(F_pk, dist, nsamp, isotropic, burst=True,
+    return luminosity(F_pk, dist=dist, nsamp=nsamp, burst=True, dip=dip,
+                   isotropic=isotropic, inclination=inclination,
                    imin=imin, imax=imax, model='he16_a', conf=conf, fulldist=fulldist)
 
 # ------- --------- --------- --------- --------- --------- --------- ---------